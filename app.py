@@ -1,205 +1,151 @@
 import streamlit as st
-import json
-import math
-import random
-import re
 
-st.set_page_config(page_title="ARC People, Projects & Organisations Map Entry Generator 🌍")
+from pins_core import ID_RE, ZONE_OPTIONS, ZONE_RECORDS, dumps_entry, generate_random_coordinate, is_valid_url, zone_label
 
-st.markdown(
-    """
-    <style>
-    @import url('https://fonts.googleapis.com/css2?family=Ubuntu&display=swap');
-    * {
-        font-family: 'Ubuntu', sans-serif !important;
-        font-size: 18px !important;
-    }
-    a {
-        color: inherit !important;
-        text-decoration: none !important;
-    }
-    </style>
-    """,
-    unsafe_allow_html=True
-)
+st.set_page_config(page_title="ARC People, Projects & Organisations Map Entry Generator 🌍")
 
-CLIMATE_ZONES = {
-    'Af': ('Tropical rainforest', '#0000fe'),
-    'Am': ('Tropical monsoon', '#0078ff'),
-    'Aw': ('Tropical savanna', '#45aafa'),
-    'BWh': ('Hot desert', '#fe0000'),
-    'BWk': ('Cold desert', '#fe9695'),
-    'BSh': ('Hot semi-arid', '#f4a500'),
-    'BSk': ('Cold semi-arid', '#ffdc64'),
-    'Csa': ('Hot-summer Mediterranean', '#ffff00'),
-    'Csb': ('Warm-summer Mediterranean', '#c7c800'),
-    'Csc': ('Cold-summer Mediterranean', '#969600'),
-    'Cwa': ('Humid subtropical (dry winter)', '#96ff96'),
-    'Cwb': ('Subtropical highland (dry winter)', '#64c865'),
-    'Cwc': ('Cold subtropical highland (dry winter)', '#329633'),
-    'Cfa': ('Humid subtropical', '#c9ff51'),
-    'Cfb': ('Temperate oceanic', '#65ff51'),
-    'Cfc': ('Subpolar oceanic', '#31c800'),
-    'Dsa': ('Hot-summer continental (dry summer)', '#ff00fe'),
-    'Dsb': ('Warm-summer continental (dry summer)', '#c900c8'),
-    'Dsc': ('Subarctic (dry summer)', '#963295'),
-    'Dsd': ('Extreme subarctic (dry summer)', '#963295'),
-    'Dwa': ('Hot-summer continental (dry winter)', '#aaafff'),
-    'Dwb': ('Warm-summer continental (dry winter)', '#5a77db'),
-    'Dwc': ('Subarctic (dry winter)', '#4b50b4'),
-    'Dwd': ('Extreme subarctic (dry winter)', '#320087'),
-    'Dfa': ('Hot-summer continental', '#00ffff'),
-    'Dfb': ('Warm-summer continental', '#37c8ff'),
-    'Dfc': ('Subarctic', '#007e7d'),
-    'Dfd': ('Extreme subarctic', '#00465f'),
-    'ET': ('Tundra', '#b2b2b2'),
-    'EF': ('Ice cap', '#666666'),
+CSS = """
+<style>
+@import url('https://fonts.googleapis.com/css2?family=Ubuntu&display=swap');
+* {
+    font-family: 'Ubuntu', sans-serif !important;
+    font-size: 18px !important;
+}
+a {
+    color: inherit !important;
+    text-decoration: none !important;
 }
+</style>
+"""
 
-HEX_COLOR_RE = re.compile(r'^#(?:[0-9A-Fa-f]{3}){1,2}$')
-URL_RE = re.compile(
-    r'^(https?://)'
-    r'(([A-Za-z0-9-]+\.)+[A-Za-z]{2,6}|localhost|\d{1,3}(?:\.\d{1,3}){3})'
-    r'(?::\d+)?(/\S*)?$'
+H1_HTML = (
+    "<h1 style='font-family:Ubuntu; font-size:32px; font-weight:bold;'>"
+    "ARC People, Projects & Organisations Map Entry Generator 🌍</h1>"
+)
+LISTING_TYPE_HTML = (
+    "<h2 style='font-family:Ubuntu; font-size:24px; font-weight:bold;'>"
+    "Are you listing a Project, a Person, or an Organisation?</h2>"
+)
+LOCATION_HTML = "<h2 style='font-family:Ubuntu; font-size:24px; font-weight:bold;'>Precise location coordinates</h2>"
+IMAGE_HELP_HTML = """
+If your image isn't already hosted online, you can upload it via
+<a href="https://postimages.org/" target="_blank" rel="noopener noreferrer">postimages.org</a>.<br>
+Just drag and drop your image, then copy the link labelled <strong>Direct Link</strong> and paste it below.
+"""
+SUBMIT_NOTE_HTML = (
+    "<small>For inclusion on the public map, please click the button in the top right corner of the box to copy the text, "
+    "and email it archwrth@gmail.com.</small>"
 )
 
-def is_valid_url(url):
-    return bool(URL_RE.match(url))
-
-# Enforce minimum displacement of 1 km from true location
-def generate_random_coordinate(lat, lon, radius_m=5000, min_radius_m=1000):
-    R = 6371000  # Earth's radius in metres
-    lat_rad = math.radians(lat)
-    d = random.uniform(min_radius_m, radius_m)
-    theta = random.uniform(0, 2 * math.pi)
-    ang = d / R
-    new_lat_rad = math.asin(
-        math.sin(lat_rad) * math.cos(ang) +
-        math.cos(lat_rad) * math.sin(ang) * math.cos(theta)
-    )
-    new_lon_rad = math.radians(lon) + math.atan2(
-        math.sin(theta) * math.sin(ang) * math.cos(lat_rad),
-        math.cos(ang) - math.sin(lat_rad) * math.sin(new_lat_rad)
-    )
-    new_lat = math.degrees(new_lat_rad)
-    new_lon = math.degrees(new_lon_rad)
-    new_lat = max(min(new_lat, 90), -90)
-    new_lon = ((new_lon + 180) % 360) - 180
-    return new_lat, new_lon
+# Not cached: st.cache_* replays the elements a cached function emitted on every run, so the style block is sent either way
+def inject_css():
+    st.markdown(CSS, unsafe_allow_html=True)
+
+# Reuse the last mask while its inputs are unchanged instead of re-rolling it on every submit
+def masked_coordinate(lat, lon, radius_km):
+    key = (lat, lon, radius_km)
+    cached = st.session_state.get("masked_coordinate")
+    if cached is None or cached[0] != key:
+        cached = (key, generate_random_coordinate(lat, lon, radius_m=radius_km * 1000, min_radius_m=1000))
+        st.session_state["masked_coordinate"] = cached
+    return cached[1]
 
 def main():
-    st.markdown(
-        "<h1 style='font-family:Ubuntu; font-size:32px; font-weight:bold;'>"
-        "ARC People, Projects & Organisations Map Entry Generator 🌍</h1>",
-        unsafe_allow_html=True
-    )
-
-    entry = {}
-    red_star = "<span style='color:#dc3545'>*</span>"
-
-    st.markdown(
-        f"Please provide a unique ID for admin purposes only. No caps or spaces. {red_star} (e.g. 'house5')",
-        unsafe_allow_html=True
-    )
-    entry['id'] = st.text_input("", key="id_input", label_visibility="collapsed")
-    valid_id = bool(entry['id']) and re.match(r'^[a-z0-9_-]+$', entry['id'])
-    if entry['id'] and not valid_id:
-        st.error("ID must use only lowercase letters, numbers, hyphens or underscores.")
-
-    st.markdown(
-        "<h2 style='font-family:Ubuntu; font-size:24px; font-weight:bold;'>"
-        "Are you listing a Project, a Person, or an Organisation?</h2>",
-        unsafe_allow_html=True
-    )
-    listing_type = st.radio("", ["Project", "Person", "Organisation"], index=0, key="listing_type", label_visibility="collapsed")
-    entry['type'] = listing_type
-
-    title_prompt = {
-        "Project": "Please enter a title to display publicly as your project title",
-        "Person": "Please enter your full name to be displayed publicly.",
-        "Organisation": "Please enter your organisation name to be displayed publicly.",
-    }
-    st.markdown(f"{title_prompt[listing_type]} {red_star}", unsafe_allow_html=True)
-    title = st.text_input("", key="title_input", label_visibility="collapsed")
-    entry['title'] = title
-
-    st.markdown(
-        "Link to further information you'd like to share (optional, must start with https://)" if listing_type == "Project"
-        else "", unsafe_allow_html=True
-    )
-    link_val = st.text_input("", key="link_input", label_visibility="collapsed") if listing_type == "Project" else ""
-    entry['link'] = link_val if link_val.startswith("https://") else ("https://actionresearchprojects.net/people" if listing_type in ("Person", "Organisation") else "")
-
-    st.markdown(
-        "Address/description of location (optional, will be displayed publicly)", unsafe_allow_html=True
-    )
-    entry['address'] = st.text_input("", key="address_input", label_visibility="collapsed")
-
-    st.markdown(f"Select a climate zone {red_star}", unsafe_allow_html=True)
-    zone_labels = [f"{name} ({code})" for code, (name, _) in CLIMATE_ZONES.items()]
-    selected = st.selectbox("", options=[""] + zone_labels, key="zone_select", label_visibility="collapsed")
-    if selected:
-        code = selected.split()[-1].strip("()")
-        entry['zones'] = [{
-            'code': code,
-            'text': f"{CLIMATE_ZONES[code][0]} ({code})",
-            'colour': CLIMATE_ZONES[code][1]
-        }]
-    else:
-        entry['zones'] = []
-
-    st.markdown(
-        "<h2 style='font-family:Ubuntu; font-size:24px; font-weight:bold;'>Precise location coordinates</h2>",
-        unsafe_allow_html=True
-    )
-    col1, col2 = st.columns(2)
-    with col1:
-        lat = st.number_input("Latitude (decimal degrees)", -90.0, 90.0, format="%.6f", key="lat_input")
-    with col2:
-        lon = st.number_input("Longitude (decimal degrees)", -180.0, 180.0, format="%.6f", key="lon_input")
-
-    st.markdown(
-        f"You may opt to randomise your coordinates within a chosen radius for privacy. {red_star}",
-        unsafe_allow_html=True
-    )
-    mask_choice = st.radio("", ["Yes", "No"], key="mask_radio", label_visibility="collapsed")
-    if mask_choice == "Yes":
-        st.markdown(f"Select mask radius in km (we advise a 5km radius for privacy) {red_star}", unsafe_allow_html=True)
-        radius_km = st.slider("", 2, 10, 5, key="mask_radius")
-        mlat, mlon = generate_random_coordinate(lat, lon, radius_m=radius_km * 1000, min_radius_m=1000)
-        entry.update(latitude=mlat, longitude=mlon, radiusKm=radius_km, gdpr=True)
-    else:
-        entry.update(latitude=lat, longitude=lon, radiusKm=0, gdpr=False)
-
-    st.markdown(
-        """
-        Image URL (optional, will appear publicly, must start with https://)<br>
-        If your image isn't already hosted online, you can upload it via
-        <a href="https://postimages.org/" target="_blank" rel="noopener noreferrer">postimages.org</a>.<br>
-        Just drag and drop your image, then copy the link labelled <strong>Direct Link</strong> and paste it here.
-        """,
-        unsafe_allow_html=True
-    )
-    img_val = st.text_input("", key="image_input", label_visibility="collapsed")
-    entry['imageUrl'] = img_val if img_val.startswith("http") else ""
-
-    pin_colours = {"Project": "#006400", "Person": "#0db8b8", "Organisation": "#e6b800"}
-    entry['colour'] = pin_colours[listing_type]
+    inject_css()
+    st.markdown(H1_HTML, unsafe_allow_html=True)
+
+    # Outside the form: the listing type decides which fields the form shows
+    st.markdown(LISTING_TYPE_HTML, unsafe_allow_html=True)
+    listing_type = st.radio("Listing type", ["Project", "Person", "Organisation"], index=0, key="listing_type", label_visibility="collapsed")
+
+    # Widgets inside the form only trigger a rerun when the form is submitted
+    with st.form("entry_form"):
+        # Widget labels render Markdown, so :red[*] marks required fields without a separate st.markdown element
+        entry_id = st.text_input(
+            "Please provide a unique ID for admin purposes only. No caps or spaces. :red[*] (e.g. 'house5')", key="id_input"
+        )
+        valid_id = bool(entry_id) and ID_RE.fullmatch(entry_id) is not None
+        if entry_id and not valid_id:
+            st.error("ID must use only lowercase letters, numbers, hyphens or underscores.")
+
+        title_prompt = {
+            "Project": "Please enter a title to display publicly as your project title",
+            "Person": "Please enter your full name to be displayed publicly.",
+            "Organisation": "Please enter your organisation name to be displayed publicly.",
+        }
+        title = st.text_input(f"{title_prompt[listing_type]} :red[*]", key="title_input")
+
+        if listing_type == "Project":
+            link_val = st.text_input(
+                "Link to further information you'd like to share (optional, must start with https://)", key="link_input"
+            )
+        else:
+            link_val = ""
+
+        address = st.text_input("Address/description of location (optional, will be displayed publicly)", key="address_input")
+
+        selected = st.selectbox("Select a climate zone :red[*]", options=ZONE_OPTIONS, format_func=zone_label, key="zone_select")
+
+        st.markdown(LOCATION_HTML, unsafe_allow_html=True)
+        col1, col2 = st.columns(2)
+        with col1:
+            lat = st.number_input("Latitude (decimal degrees)", -90.0, 90.0, format="%.6f", key="lat_input")
+        with col2:
+            lon = st.number_input("Longitude (decimal degrees)", -180.0, 180.0, format="%.6f", key="lon_input")
+
+        mask_choice = st.radio(
+            "You may opt to randomise your coordinates within a chosen radius for privacy. :red[*]", ["Yes", "No"], key="mask_radio"
+        )
+        radius_km = st.slider(
+            "If randomising, select mask radius in km (we advise a 5km radius for privacy)", 2, 10, 5, key="mask_radius"
+        )
+
+        st.markdown(IMAGE_HELP_HTML, unsafe_allow_html=True)
+        img_val = st.text_input("Image URL (optional, will appear publicly, must start with https://)", key="image_input")
+
+        submitted = st.form_submit_button("Generate JSON")
 
     st.markdown("### ✅ Output JSON")
-    valid_link = (listing_type in ("Person", "Organisation")) or entry['link'].startswith("https://") or entry['link'] == ""
-    valid_image = entry['imageUrl'] == "" or entry['imageUrl'].startswith("http")
-    mandatory = all([entry['id'], entry['title'], entry['zones'], mask_choice in ["Yes", "No"], valid_link, valid_image])
+    if not submitted:
+        st.info("Fill in all required fields (marked *) and press Generate JSON.")
+        return
+
+    link_ok = link_val.startswith("https://") and is_valid_url(link_val)
+    link = link_val if link_ok else ("https://actionresearchprojects.net/people" if listing_type in ("Person", "Organisation") else "")
+    zones = [ZONE_RECORDS[selected]] if selected else []
+    image_ok = img_val.startswith("https://") and is_valid_url(img_val)
+    image_url = img_val if image_ok else ""
+
+    valid_link = (listing_type in ("Person", "Organisation")) or link_ok or not link_val
+    valid_image = image_ok or not img_val
+    mandatory = valid_id and bool(title) and bool(zones) and valid_link and valid_image
     if not valid_link:
-        st.error("Link must start with https:// or be left blank.")
-    if entry['imageUrl'] and not valid_image:
-        st.error("Image URL must start with https://")
+        st.error("Link must be a valid URL starting with https:// or be left blank.")
+    if not valid_image:
+        st.error("Image URL must be a valid URL starting with https://")
     if mandatory:
-        st.code(json.dumps(entry, indent=2), language="json")
-        st.markdown(
-            "<small>For inclusion on the public map, please click the button in the top right corner of the box to copy the text, and email it archwrth@gmail.com.</small>",
-            unsafe_allow_html=True
-        )
+        # Only mask once the entry is complete, so incomplete submits don't re-roll the stored mask
+        if mask_choice == "Yes":
+            latitude, longitude = masked_coordinate(lat, lon, radius_km)
+        else:
+            latitude, longitude = lat, lon
+        pin_colours = {"Project": "#006400", "Person": "#0db8b8", "Organisation": "#e6b800"}
+        entry = {
+            'id': entry_id,
+            'type': listing_type,
+            'title': title,
+            'link': link,
+            'address': address,
+            'zones': zones,
+            'latitude': latitude,
+            'longitude': longitude,
+            'radiusKm': radius_km if mask_choice == "Yes" else 0,
+            'gdpr': mask_choice == "Yes",
+            'imageUrl': image_url,
+            'colour': pin_colours[listing_type],
+        }
+        st.code(dumps_entry(entry), language="json")
+        st.markdown(SUBMIT_NOTE_HTML, unsafe_allow_html=True)
     else:
         st.info("Fill in all required fields (marked *) to generate JSON.")
 
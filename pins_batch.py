@@ -0,0 +1,36 @@
+# Kept apart from pins_core so the Streamlit app, which masks one pin per submit, never imports NumPy
+import os
+
+import numpy as np
+
+from pins_core import _EARTH_RADIUS_M, _TAU_53, _UNIT_53
+
+# Vectorised form of generate_random_coordinate for masking many pins at once; arguments broadcast like NumPy ufuncs.
+# Unlike the scalar path it always uses the great-circle formula, with no equirectangular shortcut below
+# pins_core._EQUIRECT_MAX_LAT, and wraps longitude into [-180, 180) rather than math.remainder's [-180, 180]
+def generate_random_coordinates_batch(lats, lons, radius_m=5000, min_radius_m=1000, rng=None):
+    lats, lons, radius_m, min_radius_m = np.broadcast_arrays(
+        np.asarray(lats, dtype=np.float64), np.asarray(lons, dtype=np.float64), radius_m, min_radius_m
+    )
+    lat_rad = np.radians(lats)
+    lon_rad = np.radians(lons)
+    if rng is None:
+        # Same OS CSPRNG draw as the scalar path; pass an rng only when a reproducible batch is wanted
+        a, b = np.frombuffer(os.urandom(16 * lat_rad.size), '<u8').reshape(2, *lat_rad.shape) >> 11
+        d = min_radius_m + a * _UNIT_53 * (radius_m - min_radius_m)
+        theta = b * _TAU_53
+    else:
+        d = rng.uniform(min_radius_m, radius_m)
+        theta = rng.uniform(0, 2 * np.pi, lat_rad.shape)
+    ang = d / _EARTH_RADIUS_M
+    new_lat_rad = np.arcsin(
+        np.sin(lat_rad) * np.cos(ang) +
+        np.cos(lat_rad) * np.sin(ang) * np.cos(theta)
+    )
+    new_lon_rad = lon_rad + np.arctan2(
+        np.sin(theta) * np.sin(ang) * np.cos(lat_rad),
+        np.cos(ang) - np.sin(lat_rad) * np.sin(new_lat_rad)
+    )
+    new_lat = np.clip(np.degrees(new_lat_rad), -90, 90)
+    new_lon = np.fmod(np.degrees(new_lon_rad) + 540.0, 360.0) - 180.0
+    return new_lat, new_lon
@@ -0,0 +1,153 @@
+import functools
+import json
+import math
+import os
+import re
+import string
+import struct
+from types import MappingProxyType
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+CLIMATE_ZONES = MappingProxyType({
+    'Af': ('Tropical rainforest', '#0000fe'),
+    'Am': ('Tropical monsoon', '#0078ff'),
+    'Aw': ('Tropical savanna', '#45aafa'),
+    'BWh': ('Hot desert', '#fe0000'),
+    'BWk': ('Cold desert', '#fe9695'),
+    'BSh': ('Hot semi-arid', '#f4a500'),
+    'BSk': ('Cold semi-arid', '#ffdc64'),
+    'Csa': ('Hot-summer Mediterranean', '#ffff00'),
+    'Csb': ('Warm-summer Mediterranean', '#c7c800'),
+    'Csc': ('Cold-summer Mediterranean', '#969600'),
+    'Cwa': ('Humid subtropical (dry winter)', '#96ff96'),
+    'Cwb': ('Subtropical highland (dry winter)', '#64c865'),
+    'Cwc': ('Cold subtropical highland (dry winter)', '#329633'),
+    'Cfa': ('Humid subtropical', '#c9ff51'),
+    'Cfb': ('Temperate oceanic', '#65ff51'),
+    'Cfc': ('Subpolar oceanic', '#31c800'),
+    'Dsa': ('Hot-summer continental (dry summer)', '#ff00fe'),
+    'Dsb': ('Warm-summer continental (dry summer)', '#c900c8'),
+    'Dsc': ('Subarctic (dry summer)', '#963295'),
+    'Dsd': ('Extreme subarctic (dry summer)', '#963295'),
+    'Dwa': ('Hot-summer continental (dry winter)', '#aaafff'),
+    'Dwb': ('Warm-summer continental (dry winter)', '#5a77db'),
+    'Dwc': ('Subarctic (dry winter)', '#4b50b4'),
+    'Dwd': ('Extreme subarctic (dry winter)', '#320087'),
+    'Dfa': ('Hot-summer continental', '#00ffff'),
+    'Dfb': ('Warm-summer continental', '#37c8ff'),
+    'Dfc': ('Subarctic', '#007e7d'),
+    'Dfd': ('Extreme subarctic', '#00465f'),
+    'ET': ('Tundra', '#b2b2b2'),
+    'EF': ('Ice cap', '#666666'),
+})
+
+ID_RE = re.compile(r'[a-z0-9_-]+')
+
+_HOST_LABEL_CHARS = frozenset(string.ascii_letters + string.digits + '-')
+_ASCII_LETTERS = frozenset(string.ascii_letters)
+_ASCII_DIGITS = frozenset(string.digits)
+
+def _is_valid_host(host):
+    if host == 'localhost':
+        return True
+    labels = host.split('.')
+    if len(labels) == 4 and all(0 < len(p) <= 3 and _ASCII_DIGITS.issuperset(p) for p in labels):
+        return True
+    tld = labels.pop()
+    return (
+        bool(labels) and 2 <= len(tld) <= 6 and _ASCII_LETTERS.issuperset(tld)
+        and all(label and _HOST_LABEL_CHARS.issuperset(label) for label in labels)
+    )
+
+# http(s)://, then a dotted hostname with a 2-6 letter TLD, localhost or an IPv4 address,
+# an optional numeric port and an optional whitespace-free path; one left-to-right pass, no backtracking
+def is_valid_url(url):
+    if url.startswith('https://'):
+        rest = url[8:]
+    elif url.startswith('http://'):
+        rest = url[7:]
+    else:
+        return False
+    authority, slash, path = rest.partition('/')
+    if slash and any(c.isspace() for c in path):
+        return False
+    host, colon, port = authority.partition(':')
+    if colon and not (port and _ASCII_DIGITS.issuperset(port)):
+        return False
+    return _is_valid_host(host)
+
+def dumps_entry(entry):
+    if orjson is not None:
+        return orjson.dumps(entry, option=orjson.OPT_INDENT_2).decode()
+    return json.dumps(entry, indent=2, ensure_ascii=False)
+
+# Derived once at import; Streamlit re-executes app.py on every rerun but not this module
+ZONE_OPTIONS = ("",) + tuple(CLIMATE_ZONES)
+ZONE_RECORDS = {
+    code: {'code': code, 'text': f"{name} ({code})", 'colour': colour}
+    for code, (name, colour) in CLIMATE_ZONES.items()
+}
+
+# format_func for the zone selectbox, whose option values are the raw codes
+def zone_label(code):
+    return ZONE_RECORDS[code]['text'] if code else ""
+
+@functools.lru_cache(maxsize=32)
+def _lat_trig(lat):
+    lat_rad = math.radians(lat)
+    return math.sin(lat_rad), math.cos(lat_rad)
+
+_EARTH_RADIUS_M = 6371000.0
+
+# Equirectangular offsets stay within 0.2% of the great-circle distance below 80 degrees latitude
+_EQUIRECT_MAX_LAT = 80.0
+
+def _offset_coordinate(lat, sin_lat, cos_lat, lon, d, theta):
+    ang = d / _EARTH_RADIUS_M
+    if abs(lat) <= _EQUIRECT_MAX_LAT:
+        return (
+            lat + math.degrees(ang * math.cos(theta)),
+            lon + math.degrees(ang * math.sin(theta) / cos_lat)
+        )
+    sin_ang = math.sin(ang)
+    cos_ang = math.cos(ang)
+    sin_new_lat = sin_lat * cos_ang + cos_lat * sin_ang * math.cos(theta)
+    new_lat_rad = math.asin(sin_new_lat)
+    new_lon_rad = math.radians(lon) + math.atan2(
+        math.sin(theta) * sin_ang * cos_lat,
+        cos_ang - sin_lat * sin_new_lat
+    )
+    return math.degrees(new_lat_rad), math.degrees(new_lon_rad)
+
+# Compiled with Numba when it is installed; importing Numba and compiling happen on the first masked submit rather
+# than at import, so app startup doesn't pay for a kernel that runs once per submit
+@functools.lru_cache(maxsize=None)
+def _offset_kernel():
+    try:
+        from numba import njit
+    except ImportError:
+        return _offset_coordinate
+    return njit(
+        'UniTuple(float64, 2)(float64, float64, float64, float64, float64, float64)', cache=True, fastmath=True
+    )(_offset_coordinate)
+
+# Scale factors turning a 53-bit random integer into a fraction of [0, 1) and into a bearing in [0, tau)
+_UNIT_53 = 1.0 / (1 << 53)
+_TAU_53 = math.tau / (1 << 53)
+
+# Enforce minimum displacement of 1 km from true location
+def generate_random_coordinate(lat, lon, radius_m=5000, min_radius_m=1000):
+    # Draw distance and bearing from the OS CSPRNG so the mask can't be predicted from earlier outputs
+    a, b = struct.unpack('<QQ', os.urandom(16))
+    d = min_radius_m + (a >> 11) * _UNIT_53 * (radius_m - min_radius_m)
+    theta = (b >> 11) * _TAU_53
+    sin_lat, cos_lat = _lat_trig(lat)
+    new_lat, new_lon = _offset_kernel()(lat, sin_lat, cos_lat, lon, d, theta)
+    new_lat = min(90.0, max(-90.0, new_lat))
+    # IEEE remainder wraps straight into [-180, 180]
+    new_lon = math.remainder(new_lon, 360.0)
+    return new_lat, new_lon